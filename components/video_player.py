@@ -5,50 +5,99 @@ that updates scene cards based on playback position.
 """
 import streamlit as st
 import streamlit.components.v1 as components
-import base64
+from streamlit import runtime
 import json
-from pathlib import Path
+import numpy as np
 
 
-def create_synced_video_player(video_data: bytes, scenes: list, height: int = 600):
+# Fixed card geometry, required for windowed rendering of the scene list
+CARD_HEIGHT = 130
+CARD_GAP = 12
+OVERSCAN = 5
+
+# Slots per second in the precomputed time -> scene lookup table
+SEEK_TABLE_RESOLUTION = 10
+
+
+def _get_video_url(video_path: str) -> str:
+    """
+    Registers the video with Streamlit's media file manager (the same
+    endpoint st.video uses) and returns its URL. The /media route supports
+    HTTP range requests, so the browser can stream and seek.
+    
+    Note: the manager keeps served files in server memory. Each call reads
+    and MD5-hashes the whole file (and must run on every rerun to keep the
+    URL alive), but identical files are stored only once. This trades the
+    base64 copy for one in-memory copy, the same cost as st.video; it does
+    not serve from disk.
+    """
+    url = runtime.get_instance().media_file_mgr.add(
+        video_path, "video/mp4", "synced_video_player"
+    )
+    base_path = st.get_option("server.baseUrlPath").strip("/")
+    return f"/{base_path}{url}" if base_path else url
+
+
+def _format_time(seconds: float) -> str:
+    """Formats seconds as m:ss."""
+    mins, secs = divmod(int(seconds), 60)
+    return f"{mins}:{secs:02d}"
+
+
+def _player_scenes(scenes: list) -> list:
+    """
+    Maps result rows to the compact shape used by the player, with numeric
+    bounds and preformatted time labels so the browser does no parsing.
+    """
+    player_scenes = []
+    for scene in scenes:
+        start = float(scene['Start_Time_s'])
+        end = float(scene['End_Time_s'])
+        player_scenes.append({
+            "id": scene['Scene_ID'],
+            "start": start,
+            "end": end,
+            "startLabel": _format_time(start),
+            "endLabel": _format_time(end),
+            "description": scene['Description'],
+            "tags": scene['Tags'],
+            "mood": scene['Mood'],
+        })
+    return player_scenes
+
+
+def _build_seek_table(player_scenes: list) -> list:
+    """
+    Maps every 1/SEEK_TABLE_RESOLUTION s slot of the video to the index of
+    the last scene starting at or before the slot (-1 for none). The player
+    starts its lookup there and only steps over scenes starting inside the
+    slot, so finding the active scene stays O(1) but exact.
+    """
+    if not player_scenes:
+        return []
+    starts = np.array([scene["start"] for scene in player_scenes])
+    ends = np.array([scene["end"] for scene in player_scenes])
+    slots = np.arange(int(np.ceil(ends.max() * SEEK_TABLE_RESOLUTION))) / SEEK_TABLE_RESOLUTION
+    return (np.searchsorted(starts, slots, side="right") - 1).tolist()
+
+
+def create_synced_video_player(video_path: str, scenes: list, height: int = 600):
     """
     Creates a custom HTML5 video player with synchronized scene cards.
     
     Args:
-        video_data: Raw bytes of the video file
+        video_path: Path to the video file on disk
         scenes: List of scene dicts with 'Scene_ID', 'Start_Time_s', 'End_Time_s', 'Description', 'Tags', 'Mood'
         height: Height of the component in pixels
     """
     
-    # Encode as base64 for embedding
-    video_b64 = base64.b64encode(video_data).decode()
+    # Serve the video by URL instead of embedding it
+    video_url = _get_video_url(video_path)
     
-    # Convert scenes to JSON for JavaScript
-    scenes_json = json.dumps(scenes, ensure_ascii=False)
-    
-    # Generate scene cards HTML
-    scene_cards_html = ""
-    for scene in scenes:
-        scene_cards_html += f'''
-        <div class="scene-card" 
-             data-start="{scene['Start_Time_s']}" 
-             data-end="{scene['End_Time_s']}"
-             data-scene-id="{scene['Scene_ID']}"
-             onclick="seekToScene({scene['Start_Time_s']})">
-            <div class="scene-header">
-                Szene {scene['Scene_ID']} • {scene['Start_Time_s']}s - {scene['End_Time_s']}s
-            </div>
-            <div class="scene-description">
-                {scene['Description']}
-            </div>
-            <div class="scene-tags">
-                🏷️ {scene['Tags']}
-            </div>
-            <div class="scene-mood">
-                😊 {scene['Mood']}
-            </div>
-        </div>
-        '''
+    # Convert scenes to JSON for JavaScript (cards are rendered client-side)
+    player_scenes = _player_scenes(scenes)
+    scenes_json = json.dumps(player_scenes, ensure_ascii=False).replace("</", "<\\/")
+    seek_table_json = json.dumps(_build_seek_table(player_scenes), separators=(",", ":"))
     
     html_content = f'''
     <!DOCTYPE html>
@@ -77,9 +126,18 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
             }}
             .scenes-section {{
                 flex: 3;
+                display: flex;
+                flex-direction: column;
+                min-height: 0;
+            }}
+            #scenesViewport {{
+                flex: 1;
                 overflow-y: auto;
                 padding-right: 10px;
             }}
+            #scenesSpacer {{
+                position: relative;
+            }}
             video {{
                 width: 100%;
                 border-radius: 8px;
@@ -94,10 +152,14 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
                 color: #888;
             }}
             .scene-card {{
+                position: absolute;
+                left: 0;
+                right: 0;
+                height: {CARD_HEIGHT}px;
+                overflow: hidden;
                 border: 2px solid #333;
                 border-radius: 8px;
                 padding: 12px;
-                margin-bottom: 12px;
                 background: #1a1a1a;
                 cursor: pointer;
                 transition: all 0.3s ease;
@@ -123,11 +185,18 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
                 font-weight: 500;
                 margin-bottom: 8px;
                 line-height: 1.4;
+                display: -webkit-box;
+                -webkit-line-clamp: 2;
+                -webkit-box-orient: vertical;
+                overflow: hidden;
             }}
             .scene-tags {{
                 color: #aaa;
                 font-size: 0.9em;
                 margin-bottom: 4px;
+                white-space: nowrap;
+                overflow: hidden;
+                text-overflow: ellipsis;
             }}
             .scene-mood {{
                 color: #888;
@@ -140,18 +209,18 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
                 color: #fff;
             }}
             /* Custom scrollbar */
-            .scenes-section::-webkit-scrollbar {{
+            #scenesViewport::-webkit-scrollbar {{
                 width: 8px;
             }}
-            .scenes-section::-webkit-scrollbar-track {{
+            #scenesViewport::-webkit-scrollbar-track {{
                 background: #1a1a1a;
                 border-radius: 4px;
             }}
-            .scenes-section::-webkit-scrollbar-thumb {{
+            #scenesViewport::-webkit-scrollbar-thumb {{
                 background: #444;
                 border-radius: 4px;
             }}
-            .scenes-section::-webkit-scrollbar-thumb:hover {{
+            #scenesViewport::-webkit-scrollbar-thumb:hover {{
                 background: #555;
             }}
         </style>
@@ -159,8 +228,7 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
     <body>
         <div class="container">
             <div class="video-section">
-                <video id="videoPlayer" controls>
-                    <source src="data:video/mp4;base64,{video_b64}" type="video/mp4">
+                <video id="videoPlayer" controls preload="metadata" data-src="{video_url}">
                     Your browser does not support the video tag.
                 </video>
                 <div class="current-time" id="timeDisplay">
@@ -169,16 +237,31 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
             </div>
             <div class="scenes-section">
                 <div class="scenes-header">📊 {len(scenes)} Szenen</div>
-                {scene_cards_html}
+                <div id="scenesViewport">
+                    <div id="scenesSpacer"></div>
+                </div>
             </div>
         </div>
         
         <script>
             const video = document.getElementById('videoPlayer');
             const timeDisplay = document.getElementById('timeDisplay');
-            const sceneCards = document.querySelectorAll('.scene-card');
+            const viewport = document.getElementById('scenesViewport');
+            const spacer = document.getElementById('scenesSpacer');
             const scenes = {scenes_json};
             
+            // Last scene starting at or before each 1/SEEK_TABLE_RESOLUTION s slot
+            const seekTable = new Int32Array({seek_table_json});
+            const SEEK_TABLE_RESOLUTION = {SEEK_TABLE_RESOLUTION};
+            
+            const ROW_HEIGHT = {CARD_HEIGHT + CARD_GAP};
+            const OVERSCAN = {OVERSCAN};
+            const renderedCards = new Map();  // scene index -> card element
+            let activeIndex = -1;
+            let lastDisplay = '';
+            
+            spacer.style.height = (scenes.length * ROW_HEIGHT) + 'px';
+            
             function formatTime(seconds) {{
                 const mins = Math.floor(seconds / 60);
                 const secs = Math.floor(seconds % 60);
@@ -186,45 +269,144 @@ def create_synced_video_player(video_data: bytes, scenes: list, height: int = 60
             }}
             
             function seekToScene(startTime) {{
-                video.currentTime = parseFloat(startTime);
+                video.currentTime = startTime;
                 video.play();
             }}
             
+            function createCard(index) {{
+                const scene = scenes[index];
+                const card = document.createElement('div');
+                card.className = 'scene-card';
+                card.style.top = (index * ROW_HEIGHT) + 'px';
+                card.addEventListener('click', () => seekToScene(scene.start));
+                
+                const fields = [
+                    ['scene-header', 'Szene ' + scene.id + ' • ' + scene.startLabel + ' - ' + scene.endLabel],
+                    ['scene-description', scene.description],
+                    ['scene-tags', '🏷️ ' + scene.tags],
+                    ['scene-mood', '😊 ' + scene.mood],
+                ];
+                for (const [className, text] of fields) {{
+                    const el = document.createElement('div');
+                    el.className = className;
+                    el.textContent = text;
+                    card.appendChild(el);
+                }}
+                return card;
+            }}
+            
+            // Mount only the cards inside the visible window (plus overscan)
+            function renderWindow() {{
+                const first = Math.max(0, Math.floor(viewport.scrollTop / ROW_HEIGHT) - OVERSCAN);
+                const last = Math.min(
+                    scenes.length - 1,
+                    Math.ceil((viewport.scrollTop + viewport.clientHeight) / ROW_HEIGHT) + OVERSCAN
+                );
+                
+                for (const [index, card] of renderedCards) {{
+                    if (index < first || index > last) {{
+                        card.remove();
+                        renderedCards.delete(index);
+                    }}
+                }}
+                for (let index = first; index <= last; index++) {{
+                    if (!renderedCards.has(index)) {{
+                        const card = createCard(index);
+                        card.classList.toggle('active', index === activeIndex);
+                        spacer.appendChild(card);
+                        renderedCards.set(index, card);
+                    }}
+                }}
+            }}
+            
+            let renderPending = false;
+            viewport.addEventListener('scroll', () => {{
+                if (renderPending) return;
+                renderPending = true;
+                requestAnimationFrame(() => {{
+                    renderPending = false;
+                    renderWindow();
+                }});
+            }});
+            
+            // (Re-)mount once the list becomes visible, e.g. after switching tabs
+            new IntersectionObserver(entries => {{
+                if (entries.some(entry => entry.isIntersecting)) renderWindow();
+            }}).observe(viewport);
+            
+            function scrollToIndex(index) {{
+                const top = index * ROW_HEIGHT;
+                const bottom = top + ROW_HEIGHT - {CARD_GAP};
+                if (top < viewport.scrollTop) {{
+                    viewport.scrollTo({{ top: top, behavior: 'smooth' }});
+                }} else if (bottom > viewport.scrollTop + viewport.clientHeight) {{
+                    viewport.scrollTo({{ top: bottom - viewport.clientHeight, behavior: 'smooth' }});
+                }}
+            }}
+            
+            function setActiveIndex(index) {{
+                // Only touch the DOM (and scroll) on scene transitions
+                if (index === activeIndex) return;
+                const prevCard = renderedCards.get(activeIndex);
+                if (prevCard) prevCard.classList.remove('active');
+                const nextCard = renderedCards.get(index);
+                if (nextCard) nextCard.classList.add('active');
+                activeIndex = index;
+                if (index >= 0) scrollToIndex(index);
+            }}
+            
+            function findSceneIndex(time) {{
+                if (!seekTable.length || time < 0) return -1;
+                const slot = Math.min(Math.floor(time * SEEK_TABLE_RESOLUTION), seekTable.length - 1);
+                // Step over scenes that start inside the slot, then check the real bounds
+                let index = seekTable[slot];
+                while (index + 1 < scenes.length && scenes[index + 1].start <= time) index++;
+                return index >= 0 && time < scenes[index].end ? index : -1;
+            }}
+            
             function updateActiveScene() {{
                 const currentTime = video.currentTime;
-                let activeSceneId = null;
                 
                 // Find active scene
-                for (let scene of scenes) {{
-                    const start = parseFloat(scene.Start_Time_s);
-                    const end = parseFloat(scene.End_Time_s);
-                    if (currentTime >= start && currentTime < end) {{
-                        activeSceneId = scene.Scene_ID;
-                        break;
-                    }}
-                }}
+                const index = findSceneIndex(currentTime);
                 
                 // Update UI
-                sceneCards.forEach(card => {{
-                    const cardSceneId = parseInt(card.dataset.sceneId);
-                    if (cardSceneId === activeSceneId) {{
-                        card.classList.add('active');
-                        // Scroll card into view
-                        card.scrollIntoView({{ behavior: 'smooth', block: 'nearest' }});
-                    }} else {{
-                        card.classList.remove('active');
-                    }}
-                }});
+                setActiveIndex(index);
                 
-                // Update time display
-                const sceneName = activeSceneId ? 'Szene ' + activeSceneId : '-';
-                timeDisplay.innerHTML = '▶️ ' + formatTime(currentTime) + ' / ' + sceneName;
+                // Update time display (only when the shown text changes)
+                const sceneName = index >= 0 ? 'Szene ' + scenes[index].id : '-';
+                const display = '▶️ ' + formatTime(currentTime) + ' / ' + sceneName;
+                if (display !== lastDisplay) {{
+                    timeDisplay.textContent = display;
+                    lastDisplay = display;
+                }}
             }}
             
-            // Update every 100ms for smooth tracking
-            video.addEventListener('timeupdate', updateActiveScene);
-            video.addEventListener('seeking', updateActiveScene);
-            video.addEventListener('play', updateActiveScene);
+            renderWindow();
+            
+            // Attach the video source only once the player is on screen
+            const videoObserver = new IntersectionObserver(entries => {{
+                if (entries.some(entry => entry.intersectionRatio > 0)) {{
+                    videoObserver.disconnect();
+                    video.src = video.dataset.src;
+                    video.load();
+                }}
+            }});
+            videoObserver.observe(video);
+            
+            // Coalesce player events into at most one update per frame
+            let updatePending = false;
+            function scheduleUpdate() {{
+                if (updatePending) return;
+                updatePending = true;
+                requestAnimationFrame(() => {{
+                    updatePending = false;
+                    updateActiveScene();
+                }});
+            }}
+            video.addEventListener('timeupdate', scheduleUpdate);
+            video.addEventListener('seeking', scheduleUpdate);
+            video.addEventListener('play', scheduleUpdate);
         </script>
     </body>
     </html>
@@ -1,15 +1,19 @@
 import streamlit as st
-import cv2
-import tempfile
 import os
 import json
+import numpy as np
 import pandas as pd
-from datetime import datetime
-from pathlib import Path
+from contextlib import closing
 import google.generativeai as genai
-from scenedetect import ContentDetector, SceneManager, open_video
-from PIL import Image
 from components.video_player import create_synced_video_player
+from pipeline import (
+    analyze_scenes,
+    detect_scenes,
+    load_history,
+    save_to_history,
+    store_upload,
+    video_duration,
+)
 
 # Config
 st.set_page_config(page_title="AI Video Tagger", layout="wide")
@@ -54,55 +58,10 @@ def check_password():
 if not check_password():
     st.stop()
 
-# History file
-HISTORY_FILE = Path("analysis_history.json")
-
-def load_history():
-    if HISTORY_FILE.exists():
-        return json.loads(HISTORY_FILE.read_text(encoding='utf-8'))
-    return []
-
-def save_to_history(video_name, results):
-    history = load_history()
-    history.insert(0, {
-        "id": len(history) + 1,
-        "video_name": video_name,
-        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
-        "scene_count": len(results),
-        "results": results
-    })
-    HISTORY_FILE.write_text(json.dumps(history, ensure_ascii=False, indent=2), encoding='utf-8')
-
-def clean_json_string(s):
-    if "```json" in s:
-        s = s.split("```json")[1].split("```")[0]
-    elif "```" in s:
-        s = s.split("```")[1].split("```")[0]
-    return s.strip()
-
-def detect_scenes(video_path):
-    video = open_video(video_path)
-    sm = SceneManager()
-    sm.add_detector(ContentDetector(threshold=27.0))
-    sm.detect_scenes(video=video)
-    return sm.get_scene_list()
-
-def extract_frame(video_path, time_ms):
-    cap = cv2.VideoCapture(video_path)
-    cap.set(cv2.CAP_PROP_POS_MSEC, time_ms)
-    ret, frame = cap.read()
-    cap.release()
-    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if ret else None
-
-def analyze_frame(frame):
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    img = Image.fromarray(frame)
-    prompt = 'Analysiere. Gib JSON: {"beschreibung": "max 20 Worte", "tags": ["t1","t2","t3"], "stimmung": "mood"}'
-    try:
-        resp = model.generate_content([prompt, img])
-        return json.loads(clean_json_string(resp.text))
-    except Exception as e:
-        return {"error": str(e)}
+@st.cache_data(show_spinner=False)
+def history_dataframe(record_id, date, _results):
+    """History records never change, so (id, date) is enough as cache key."""
+    return pd.DataFrame(_results)
 
 def render_scene_card(result):
     """Generates HTML for a single scene card."""
@@ -115,7 +74,15 @@ def render_scene_card(result):
     </div>
     """
 
-def run_analysis(video_path, video_name):
+def discard_video():
+    """Deletes the current temp video file and forgets it."""
+    if st.session_state.video_path and os.path.exists(st.session_state.video_path):
+        os.remove(st.session_state.video_path)
+    st.session_state.video_path = None
+    st.session_state.video_hash = None
+    st.session_state.video_file_id = None
+
+def run_analysis(video_path, video_hash, video_name):
     """Run the analysis and return results with live preview"""
     progress = st.progress(0)
     status = st.empty()
@@ -123,49 +90,34 @@ def run_analysis(video_path, video_name):
     # Container for live scene cards
     st.markdown("### 🎬 Erkannte Szenen")
     scene_container = st.container()
+    cards_placeholder = scene_container.empty()
+    cards_html = []
     
-    scenes = detect_scenes(video_path)
-    if not scenes:
-        cap = cv2.VideoCapture(video_path)
-        dur = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS) * 1000
-        scenes = [(pd.Timestamp(0), pd.Timestamp(dur, unit='ms'))]
-        cap.release()
+    # Scene bounds as an (n, 2) array of (start_s, end_s)
+    scenes = detect_scenes(video_path, video_hash)
+    if not len(scenes):
+        scenes = np.array([(0.0, video_duration(video_path))])
     
     status.info(f"📹 {len(scenes)} Szenen erkannt. Analysiere...")
     
+    # Consume results as they arrive; closing() cancels pending requests
+    # if the script is stopped mid-run. Rows are mirrored into session
+    # state so a stopped run can be recovered on the next rerun.
     results = []
-    for i, scene in enumerate(scenes):
-        
-        if isinstance(scene[0], pd.Timestamp):
-            start, end = 0, scene[1].value / 1e6
-        else:
-            start, end = scene[0].get_seconds() * 1000, scene[1].get_seconds() * 1000
-        
-        mid = (start + end) / 2
-        frame = extract_frame(video_path, mid)
-        
-        if frame is not None:
-            analysis = analyze_frame(frame)
-            if "error" not in analysis:
-                tags = analysis.get("tags", [])
-                result = {
-                    "Scene_ID": i + 1,
-                    "Start_Time_s": f"{start/1000:.2f}",
-                    "End_Time_s": f"{end/1000:.2f}",
-                    "Description": analysis.get("beschreibung", "-"),
-                    "Tags": ", ".join(tags) if isinstance(tags, list) else str(tags),
-                    "Mood": analysis.get("stimmung", "-")
-                }
+    st.session_state.partial_analysis = {"video_name": video_name, "results": results}
+    with closing(analyze_scenes(video_path, scenes)) as rows:
+        for done, result in enumerate(rows, start=1):
+            if result is not None:
                 results.append(result)
                 
-                # Live display: Show card immediately
-                with scene_container:
-                    st.markdown(render_scene_card(result), unsafe_allow_html=True)
-        
-        import time
-        time.sleep(0.5)
-        progress.progress((i + 1) / len(scenes))
+                # Live display: Re-render all cards in one element
+                cards_html.append(render_scene_card(result))
+                cards_placeholder.markdown("".join(cards_html), unsafe_allow_html=True)
+            
+            progress.progress(done / len(scenes))
     
+    st.session_state.partial_analysis = None
+    results.sort(key=lambda r: r["Scene_ID"])
     status.success(f"✅ Fertig! {len(results)} Szenen analysiert.")
     return results
 
@@ -183,8 +135,23 @@ st.title("🎬 AI Video Tagging Pipeline v2")
 # Simple state
 if 'results' not in st.session_state:
     st.session_state.results = None
-if 'video_bytes' not in st.session_state:
-    st.session_state.video_bytes = None
+if 'video_path' not in st.session_state:
+    st.session_state.video_path = None
+if 'video_hash' not in st.session_state:
+    st.session_state.video_hash = None
+if 'video_file_id' not in st.session_state:
+    st.session_state.video_file_id = None
+if 'partial_analysis' not in st.session_state:
+    st.session_state.partial_analysis = None
+
+# Keep the scenes analyzed so far if the last run was stopped mid-analysis
+partial = st.session_state.partial_analysis
+if partial:
+    st.session_state.partial_analysis = None
+    if partial["results"]:
+        results = sorted(partial["results"], key=lambda r: r["Scene_ID"])
+        save_to_history(partial["video_name"], results)
+        st.session_state.results = results
 
 # Tabs
 tab1, tab2 = st.tabs(["📊 Dashboard", "➕ Neue Analyse"])
@@ -195,8 +162,9 @@ with tab1:
     if not history:
         st.info("Noch keine Analysen.")
     for h in history:
-        with st.expander(f"📹 {h['video_name']} ({h['scene_count']} Szenen)"):
-            st.dataframe(pd.DataFrame(h['results']))
+        # Only open entries build and send their table
+        if st.toggle(f"📹 {h['video_name']} ({h['scene_count']} Szenen)", key=f"history_{h['id']}"):
+            st.dataframe(history_dataframe(h['id'], h['date'], h['results']))
 
 # New Analysis
 with tab2:
@@ -207,7 +175,7 @@ with tab2:
         st.success(f"✅ {len(st.session_state.results)} Szenen analysiert!")
         
         # Use custom synced player
-        create_synced_video_player(st.session_state.video_bytes, st.session_state.results)
+        create_synced_video_player(st.session_state.video_path, st.session_state.results)
             
         with st.expander("📋 Tabellen-Ansicht anzeigen"):
             st.dataframe(pd.DataFrame(st.session_state.results), use_container_width=True)
@@ -223,7 +191,7 @@ with tab2:
         with col2:
             if st.button("🔄 Neue Analyse", use_container_width=True):
                 st.session_state.results = None
-                st.session_state.video_bytes = None
+                discard_video()
                 st.rerun()
     else:
         # Show uploader
@@ -231,28 +199,25 @@ with tab2:
         uploaded = st.file_uploader("Video wählen", type=["mp4", "mov", "avi"])
         
         if uploaded:
-            # Read video bytes for later playback
-            video_bytes = uploaded.read()
-            
-            # Save to temp file for analysis
-            tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-            tfile.write(video_bytes)
-            tfile.close()
-            video_path = tfile.name
+            # Stream upload to a temp file once per upload (1 MiB chunks, no full copy in RAM)
+            if st.session_state.video_file_id != uploaded.file_id:
+                discard_video()
+                uploaded.seek(0)
+                st.session_state.video_path, st.session_state.video_hash = store_upload(uploaded)
+                st.session_state.video_file_id = uploaded.file_id
+            video_path = st.session_state.video_path
             
             # Layout: Video left, controls right
             col1, col2 = st.columns([1, 1])
             
             with col1:
-                st.video(video_bytes)
+                st.video(video_path)
             
             with col2:
                 st.success(f"✅ **{uploaded.name}** bereit")
                 
                 if st.button("🚀 Analyse starten", type="primary", use_container_width=True):
-                    # Save video bytes to session state for later playback
-                    st.session_state.video_bytes = video_bytes
-                    results = run_analysis(video_path, uploaded.name)
+                    results = run_analysis(video_path, st.session_state.video_hash, uploaded.name)
                     
                     if results:
                         save_to_history(uploaded.name, results)
@@ -260,3 +225,6 @@ with tab2:
                         st.rerun()
                     else:
                         st.error("Keine Ergebnisse.")
+        elif st.session_state.video_path:
+            # Upload was removed from the uploader
+            discard_video()
@@ -0,0 +1,242 @@
+"""
+Video analysis pipeline
+Non-UI helpers for scene detection, keyframe extraction, Gemini tagging
+and the analysis history, shared by the Streamlit entry point.
+"""
+import streamlit as st
+import cv2
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import json
+import re
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from uuid import uuid4
+import av
+import google.generativeai as genai
+from scenedetect import ContentDetector, SceneManager, open_video
+
+
+logger = logging.getLogger(__name__)
+
+# History file (append-only, one JSON record per line, oldest first)
+HISTORY_FILE = Path("analysis_history.jsonl")
+LEGACY_HISTORY_FILE = Path("analysis_history.json")
+
+# Uploads are copied to disk in chunks of this size
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Concurrent Gemini requests during analysis
+MAX_WORKERS = 8
+
+# Frames are downscaled (long edge) and JPEG-encoded before upload to Gemini
+MAX_IMAGE_SIZE = 1024
+JPEG_QUALITY = 85
+
+# Body of a ```json fenced block in Gemini responses (closing fence may be
+# missing when the output was truncated)
+JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*(?:```|\Z)", re.S)
+
+# Keyframe extraction decodes forward to targets closer than this, seeks otherwise
+SEEK_THRESHOLD_S = 2.0
+
+def migrate_legacy_history():
+    """Converts the old newest-first JSON array into the JSONL history once."""
+    if HISTORY_FILE.exists() or not LEGACY_HISTORY_FILE.exists():
+        return
+    legacy = json.loads(LEGACY_HISTORY_FILE.read_text(encoding='utf-8'))
+    # Write aside and rename, so a half-written file never counts as migrated
+    tmp_file = HISTORY_FILE.with_name(HISTORY_FILE.name + ".tmp")
+    with tmp_file.open('w', encoding='utf-8') as f:
+        for record in reversed(legacy):
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+    os.replace(tmp_file, HISTORY_FILE)
+
+def load_history():
+    migrate_legacy_history()
+    if not HISTORY_FILE.exists():
+        return []
+    history = []
+    with HISTORY_FILE.open(encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                history.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Torn line from an interrupted append
+                logger.warning("Skipping unreadable line in %s", HISTORY_FILE)
+    history.reverse()
+    return history
+
+def save_to_history(video_name, results):
+    migrate_legacy_history()
+    record = {
+        # Random id: no scan of the file, and no collisions between sessions
+        "id": uuid4().hex,
+        "video_name": video_name,
+        "date": datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "scene_count": len(results),
+        "results": results
+    }
+    line = json.dumps(record, ensure_ascii=False) + '\n'
+    if HISTORY_FILE.exists() and HISTORY_FILE.stat().st_size:
+        with HISTORY_FILE.open('rb') as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                # Don't glue the record onto a torn last line
+                line = '\n' + line
+    with HISTORY_FILE.open('a', encoding='utf-8') as f:
+        f.write(line)
+
+def clean_json_string(s):
+    m = JSON_FENCE_RE.search(s)
+    return (m.group(1) if m else s).strip()
+
+def store_upload(fileobj, suffix=".mp4"):
+    """
+    Streams an uploaded file to a new temp file in 1 MiB chunks, hashing
+    it on the way. Returns (path, sha256 hex digest of the content).
+    """
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tfile:
+        while chunk := fileobj.read(UPLOAD_CHUNK_SIZE):
+            digest.update(chunk)
+            tfile.write(chunk)
+    return tfile.name, digest.hexdigest()
+
+def detect_scenes(video_path, video_hash):
+    """
+    Returns scene bounds as an (n, 2) array of (start_s, end_s). Results
+    are cached by content hash (see store_upload), so analyzing the same
+    video again, even from a fresh upload, skips decoding.
+    """
+    return _detect_scenes(video_hash, video_path)
+
+@st.cache_data(show_spinner=False)
+def _detect_scenes(video_hash, _video_path):
+    video_path = _video_path
+    # Multi-threaded PyAV decoding; decoding dominates detection time
+    video = open_video(video_path, backend="pyav", threading_mode="AUTO")
+    sm = SceneManager()
+    # Detect on frames downscaled to ~256px width (cost independent of source resolution)
+    sm.auto_downscale = True
+    sm.add_detector(ContentDetector(threshold=27.0, min_scene_len=15))
+    sm.detect_scenes(video=video, show_progress=False)
+    return np.array(
+        [(start.get_seconds(), end.get_seconds()) for start, end in sm.get_scene_list()],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+
+def video_duration(video_path):
+    """Returns the video duration in seconds."""
+    cap = cv2.VideoCapture(video_path)
+    dur = cap.get(cv2.CAP_PROP_FRAME_COUNT) / cap.get(cv2.CAP_PROP_FPS)
+    cap.release()
+    return dur
+
+def scaled_size(width, height):
+    """Fits (width, height) into MAX_IMAGE_SIZE on the long edge, never upscaling."""
+    scale = min(1.0, MAX_IMAGE_SIZE / max(width, height))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def extract_frames(video_path, times_ms):
+    """Extract frames at the given timestamps in one decode pass.
+    
+    Frames are scaled and converted to RGB in a single swscale step and
+    produced as PIL images, so no full-resolution RGB copy is allocated.
+    Yields (index into times_ms, image or None where decoding failed) as
+    each frame is decoded, in ascending time order.
+    """
+    with av.open(video_path) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.thread_type = "AUTO"
+        start_offset = float((stream.start_time or 0) * stream.time_base)
+        decoder = None
+        last_time = None
+        for i, time_ms in sorted(enumerate(times_ms), key=lambda p: p[1]):
+            target = start_offset + time_ms / 1000
+            if decoder is None or last_time is None or target - last_time > SEEK_THRESHOLD_S:
+                # Jump to the keyframe before the target, then decode forward
+                container.seek(int(target / stream.time_base), stream=stream, backward=True)
+                decoder = container.decode(stream)
+            image = None
+            for frame in decoder:
+                last_time = frame.time
+                if last_time is not None and last_time >= target:
+                    width, height = scaled_size(frame.width, frame.height)
+                    image = frame.to_image(width=width, height=height)
+                    break
+            else:
+                decoder = None
+            yield i, image
+
+@st.cache_resource
+def get_model():
+    return genai.GenerativeModel('gemini-2.5-flash')
+
+def encode_frame(img):
+    """Encode an (already downscaled) PIL image as JPEG."""
+    buf = io.BytesIO()
+    img.save(buf, "JPEG", quality=JPEG_QUALITY)
+    return {"mime_type": "image/jpeg", "data": buf.getvalue()}
+
+def analyze_frame(blob, model):
+    prompt = 'Analysiere. Gib JSON: {"beschreibung": "max 20 Worte", "tags": ["t1","t2","t3"], "stimmung": "mood"}'
+    try:
+        resp = model.generate_content([prompt, blob])
+        return json.loads(clean_json_string(resp.text))
+    except Exception as e:
+        return {"error": str(e)}
+
+def analyze_scenes(video_path, scenes):
+    """
+    Tags the middle keyframe of each (start_s, end_s) scene with Gemini.
+    
+    Keyframes are submitted as they are decoded and analyzed concurrently;
+    this generator yields one item per scene in completion order: a result row, or None if the scene could
+    not be analyzed. Closing it early cancels requests not yet started.
+    """
+    # Resolve the cached model here; worker threads have no script context
+    model = get_model()
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+    futures = {}
+    
+    def result_row(future):
+        i = futures.pop(future)
+        start, end = scenes[i]
+        analysis = future.result()
+        if "error" in analysis:
+            return None
+        tags = analysis.get("tags", [])
+        return {
+            "Scene_ID": i + 1,
+            "Start_Time_s": f"{start:.2f}",
+            "End_Time_s": f"{end:.2f}",
+            "Description": analysis.get("beschreibung", "-"),
+            "Tags": ", ".join(tags) if isinstance(tags, list) else str(tags),
+            "Mood": analysis.get("stimmung", "-")
+        }
+    
+    try:
+        # Submit each keyframe as soon as it is decoded, so decoding overlaps
+        # the API calls. Only the JPEG blob is kept, not the decoded image.
+        keyframes = extract_frames(video_path, (scenes.mean(axis=1) * 1000).tolist())
+        with closing(keyframes):
+            for i, image in keyframes:
+                if image is None:
+                    yield None
+                else:
+                    futures[executor.submit(analyze_frame, encode_frame(image), model)] = i
+                for future in [f for f in futures if f.done()]:
+                    yield result_row(future)
+        for future in as_completed(list(futures)):
+            yield result_row(future)
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)